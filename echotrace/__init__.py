@@ -7,15 +7,18 @@ revealing anomalies through rhythm and tone.
 
 __version__ = "0.1.0"
 
-from .monitors import CPUMonitor, NetworkMonitor, SensorMonitor, TimingMonitor
+from .monitors import CPUMonitor, FastCPUMonitor, NetworkMonitor, SensorMonitor, TimingMonitor
 from .sound_engine import SoundEngine
+from .iforest import IsolationForest
 from .echotrace import EchoTrace
 
 __all__ = [
     "CPUMonitor",
+    "FastCPUMonitor",
     "NetworkMonitor", 
     "SensorMonitor",
     "TimingMonitor",
     "SoundEngine",
+    "IsolationForest",
     "EchoTrace",
 ]
@@ -60,15 +60,13 @@ Healthy systems sound coherent; failing ones sound wrong.
     
     args = parser.parse_args()
     
-    # Create EchoTrace instance
-    echo = EchoTrace(sample_interval=args.interval)
-    
-    # Run demo or monitoring
-    if args.demo:
-        output_file = args.output or "echotrace_demo.wav"
-        echo.generate_demo(output_file)
-    else:
-        echo.run(duration=args.duration, output_file=args.output)
+    # Create EchoTrace instance and run demo or monitoring
+    with EchoTrace(sample_interval=args.interval) as echo:
+        if args.demo:
+            output_file = args.output or "echotrace_demo.wav"
+            echo.generate_demo(output_file)
+        else:
+            echo.run(duration=args.duration, output_file=args.output)
         
     return 0
 
@@ -8,10 +8,14 @@ from system behavior.
 import time
 import signal
 import sys
+import threading
 import numpy as np
-from typing import Dict, Any, Optional
-from .monitors import CPUMonitor, NetworkMonitor, SensorMonitor, TimingMonitor
+from concurrent.futures import ThreadPoolExecutor
+import queue
+from typing import Dict, Any, BinaryIO, Optional, Union
+from .monitors import FastCPUMonitor, NetworkMonitor, SensorMonitor, TimingMonitor
 from .sound_engine import SoundEngine
+from .iforest import IsolationForest
 
 
 class EchoTrace:
@@ -22,6 +26,29 @@ class EchoTrace:
     audio signatures that reveal system health and anomalies.
     """
     
+    # Most audio held in memory while recording; the buffer is flushed to
+    # the output file whenever it fills
+    AUDIO_BUFFER_SECONDS = 60.0
+    
+    # Most samples waiting for synthesis; if synthesis falls further behind,
+    # the oldest waiting samples are dropped
+    MAX_PENDING_SAMPLES = 10
+    
+    # Recent [cpu, network, memory, jitter] samples the anomaly forest is
+    # trained on, and how many new samples arrive between refits
+    FEATURE_WINDOW = 512
+    REFIT_INTERVAL = 64
+    
+    # Combined metrics recorded per sample; the float32 features come first
+    # so that they can be viewed as the forest's training matrix
+    history_dtype = np.dtype([
+        ("cpu", "f4"),
+        ("net", "f4"),
+        ("mem", "f4"),
+        ("jitter", "f4"),
+        ("ts", "f8"),
+    ])
+    
     def __init__(self, sample_interval: float = 0.1, sound_duration: float = 0.1):
         """
         Initialize EchoTrace.
@@ -34,75 +61,169 @@ class EchoTrace:
         self.sound_duration = sound_duration
         
         # Initialize monitors
-        self.cpu_monitor = CPUMonitor()
+        self.cpu_monitor = FastCPUMonitor()
         self.network_monitor = NetworkMonitor()
         self.sensor_monitor = SensorMonitor()
         self.timing_monitor = TimingMonitor()
+        self._monitors = (self.cpu_monitor, self.network_monitor,
+                          self.sensor_monitor, self.timing_monitor)
+        
+        # psutil releases the GIL during its system calls, so the monitors
+        # can be sampled concurrently
+        self._pool = ThreadPoolExecutor(max_workers=len(self._monitors),
+                                        thread_name_prefix="echotrace-monitor")
         
-        # Initialize sound engine
+        # Initialize sound engine. Every live sound has the same length, so
+        # its tables and output buffer are prepared once up front.
         self.sound_engine = SoundEngine()
+        self.sound_engine.prepare(sound_duration)
+        self._out_buf = np.empty(self._samples_per_sound(), dtype=np.float32)
+        
+        # Anomaly detection over the combined metrics; until enough samples
+        # are in the window, the per-monitor scores are used instead
+        self.forest = IsolationForest()
+        self._history = np.zeros(self.FEATURE_WINDOW, dtype=self.history_dtype)
+        self._features = self._history.view(np.float32).reshape(self.FEATURE_WINDOW, -1)[:, :4]
+        self._history_idx = 0
+        self._history_count = 0
+        self._since_fit = 0
         
         # State
         self.running = False
         self.sample_count = 0
-        self.sound_history = []
+        self._audio_buf = None
+        self._widx = 0
+        self._output_file = None
+        self._wav_file = None
+        self._frames_written = 0
+        self._bars = {}
         
-    def collect_metrics(self) -> Dict[str, Any]:
-        """Collect metrics from all monitors."""
-        cpu_metrics = self.cpu_monitor.update()
-        network_metrics = self.network_monitor.update()
-        sensor_metrics = self.sensor_monitor.update()
-        timing_metrics = self.timing_monitor.update()
+    def collect_metrics(self, details: bool = True, now_ns: Optional[int] = None,
+                        timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Collect metrics from all monitors.
         
-        # Calculate anomaly scores
-        cpu_anomaly = self.cpu_monitor.get_anomaly_score()
-        network_anomaly = self.network_monitor.get_anomaly_score()
-        sensor_anomaly = self.sensor_monitor.get_anomaly_score()
-        timing_anomaly = self.timing_monitor.get_anomaly_score()
+        Args:
+            details: Include the per-monitor metrics and anomaly scores
+                under "details" (only needed for logging)
+            now_ns: Sample time from time.monotonic_ns(), used for rates and
+                intervals; read from the clock if not given
+            timestamp: Wall-clock time from time.time() that labels the
+                sample; read from the clock if not given
+        """
+        # One reading of each clock is shared by every monitor so their
+        # rates and timestamps all refer to the same sample time. The wall
+        # clock is read separately rather than derived from the monotonic
+        # one, which stops during suspend.
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        if timestamp is None:
+            timestamp = time.time()
+        futures = [self._pool.submit(monitor.update, now_ns, timestamp)
+                   for monitor in self._monitors]
+        cpu_metrics, network_metrics, sensor_metrics, timing_metrics = (
+            future.result() for future in futures
+        )
         
-        # Combined anomaly score (weighted average)
-        overall_anomaly = (
-            cpu_anomaly * 0.3 +
-            network_anomaly * 0.2 +
-            sensor_anomaly * 0.3 +
-            timing_anomaly * 0.2
+        sample = (
+            cpu_metrics["cpu_percent"],
+            network_metrics["total_bytes_rate"],
+            sensor_metrics["memory_percent"],
+            timing_metrics["jitter"],
         )
         
+        # Combined anomaly score
+        anomalies = None
+        if self.forest.fitted:
+            # Forest scores above 0.5 mark isolated samples; stretch that
+            # half to the 0-1 range
+            overall_anomaly = max(0.0, 2.0 * self.forest.score(sample) - 1.0)
+        else:
+            anomalies = self._monitor_anomalies()
+            overall_anomaly = anomalies["weighted"]
+        self._record_sample(sample, timestamp)
+        
         # Combine metrics for sound generation
         combined_metrics = {
             "cpu_percent": cpu_metrics["cpu_percent"],
             "network_rate": network_metrics["total_bytes_rate"],
             "memory_percent": sensor_metrics["memory_percent"],
             "anomaly_score": overall_anomaly,
-            "timestamp": time.time(),
-            # Additional details for logging
-            "details": {
+            "timestamp": timestamp,
+        }
+        
+        # Additional details for logging
+        if details:
+            combined_metrics["details"] = {
                 "cpu": cpu_metrics,
                 "network": network_metrics,
                 "sensor": sensor_metrics,
                 "timing": timing_metrics,
-                "anomalies": {
-                    "cpu": cpu_anomaly,
-                    "network": network_anomaly,
-                    "sensor": sensor_anomaly,
-                    "timing": timing_anomaly,
-                    "overall": overall_anomaly
-                }
+                "anomalies": dict(anomalies or self._monitor_anomalies(),
+                                  overall=overall_anomaly),
             }
-        }
         
         return combined_metrics
         
-    def run(self, duration: Optional[float] = None, output_file: Optional[str] = None):
+    def _monitor_anomalies(self) -> Dict[str, float]:
+        """Per-monitor anomaly scores and their weighted average."""
+        cpu_anomaly = self.cpu_monitor.get_anomaly_score()
+        network_anomaly = self.network_monitor.get_anomaly_score()
+        sensor_anomaly = self.sensor_monitor.get_anomaly_score()
+        timing_anomaly = self.timing_monitor.get_anomaly_score()
+        
+        return {
+            "cpu": cpu_anomaly,
+            "network": network_anomaly,
+            "sensor": sensor_anomaly,
+            "timing": timing_anomaly,
+            "weighted": (
+                cpu_anomaly * 0.3 +
+                network_anomaly * 0.2 +
+                sensor_anomaly * 0.3 +
+                timing_anomaly * 0.2
+            ),
+        }
+        
+    @property
+    def history(self) -> np.ndarray:
+        """Recent combined samples as a structured array, oldest first."""
+        if self._history_count < self.FEATURE_WINDOW:
+            return self._history[:self._history_count].copy()
+        return np.concatenate((self._history[self._history_idx:], self._history[:self._history_idx]))
+        
+    def _record_sample(self, sample, timestamp: float):
+        """Add a sample to the history, refitting the forest when due."""
+        self._history[self._history_idx] = sample + (timestamp,)
+        self._history_idx = (self._history_idx + 1) % self.FEATURE_WINDOW
+        self._history_count = min(self._history_count + 1, self.FEATURE_WINDOW)
+        self._since_fit += 1
+        
+        if self.forest.fitted:
+            due = self._since_fit >= self.REFIT_INTERVAL
+        else:
+            due = self._history_count >= self.forest.sample_size
+        if due:
+            self.forest.fit(self._features[:self._history_count])
+            self._since_fit = 0
+        
+    def run(self, duration: Optional[float] = None,
+            output_file: Optional[Union[str, BinaryIO]] = None):
         """
         Run EchoTrace monitoring and sound generation.
         
         Args:
             duration: How long to run in seconds (None = run indefinitely)
-            output_file: Optional WAV file to save audio output
+            output_file: Optional WAV file (path or binary file object) to
+                save audio output
         """
         self.running = True
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
+        
+        if output_file:
+            self._allocate_audio_buffer(duration)
+            self._output_file = output_file
+            self._frames_written = 0
         
         print("EchoTrace starting...")
         print(f"Sampling interval: {self.sample_interval}s")
@@ -119,45 +240,147 @@ class EchoTrace:
             
         signal.signal(signal.SIGINT, signal_handler)
         
+        # Metrics are sampled on a separate thread and handed over through a
+        # queue, so the psutil calls overlap with synthesizing and writing
+        # the previous sound; None marks the end of sampling
+        samples = queue.Queue(maxsize=self.MAX_PENDING_SAMPLES)
+        sampler = threading.Thread(target=self._sampler_loop, args=(samples, start_ns, duration),
+                                   name="echotrace-sampler", daemon=True)
+        sampler.start()
+        
         try:
-            while self.running:
-                # Check duration limit
-                if duration and (time.time() - start_time) >= duration:
+            while True:
+                metrics = samples.get()
+                if metrics is None:
                     break
-                    
-                # Collect metrics
-                metrics = self.collect_metrics()
                 self.sample_count += 1
                 
-                # Generate sound
-                sound = self.sound_engine.metrics_to_sound(metrics, self.sound_duration)
-                
-                # Store for output file
+                # Generate sound, straight into the recording when saving
                 if output_file:
-                    self.sound_history.append(sound)
+                    out = self._reserve_audio(len(self._out_buf))
+                else:
+                    out = self._out_buf
+                self.sound_engine.metrics_to_sound(metrics, self.sound_duration, out=out)
                     
                 # Display status
                 if self.sample_count % 10 == 0:
                     self._display_status(metrics)
-                    
-                # Wait for next sample
-                time.sleep(self.sample_interval)
                 
         except Exception as e:
             print(f"\nError: {e}")
             self.running = False
             
         finally:
+            sampler.join()
+            
             # Save audio if requested
-            if output_file and self.sound_history:
+            if output_file and (self._widx or self._wav_file):
                 print(f"\nSaving audio to {output_file}...")
-                full_audio = np.concatenate(self.sound_history)
-                self.sound_engine.save_audio(full_audio, output_file)
-                print(f"Saved {len(self.sound_history)} samples ({len(full_audio)/self.sound_engine.sample_rate:.1f}s)")
+                self._flush_audio()
+                self._wav_file.close()
+                self._wav_file = None
+                num_sounds = self._frames_written // self._samples_per_sound()
+                print(f"Saved {num_sounds} samples ({self._frames_written/self.sound_engine.sample_rate:.1f}s)")
                 
             print(f"\nTotal samples collected: {self.sample_count}")
             print("EchoTrace stopped.")
             
+    def _sampler_loop(self, samples: queue.Queue, start_ns: int, duration: Optional[float]):
+        """Collect metrics into samples every sample_interval until stopped."""
+        # Samples are scheduled against fixed deadlines so that the time
+        # spent collecting does not accumulate as drift. Deadlines are kept
+        # in integer nanoseconds so that adding up intervals is exact.
+        interval_ns = round(self.sample_interval * 1e9)
+        end_ns = start_ns + round(duration * 1e9) if duration else None
+        next_deadline = start_ns
+        
+        try:
+            while self.running:
+                # The clock reading that checks the duration limit is also
+                # the sample time of the metrics
+                now_ns = time.monotonic_ns()
+                if end_ns is not None and now_ns >= end_ns:
+                    break
+                    
+                self._hand_off(samples, self.collect_metrics(details=False, now_ns=now_ns))
+                
+                # Wait for next sample
+                next_deadline += interval_ns
+                delay_ns = next_deadline - time.monotonic_ns()
+                if delay_ns > 0:
+                    time.sleep(delay_ns / 1e9)
+                elif delay_ns < -interval_ns:
+                    # More than a period behind: drop the missed samples
+                    # rather than bursting to catch up
+                    next_deadline = time.monotonic_ns()
+                    
+        except Exception as e:
+            print(f"\nError: {e}")
+            self.running = False
+            
+        finally:
+            self._hand_off(samples, None)
+            
+    @staticmethod
+    def _hand_off(samples: queue.Queue, metrics: Optional[Dict[str, Any]]):
+        """
+        Queue metrics for synthesis without waiting on the consumer.
+        
+        When the queue is full the oldest samples are dropped, like missed
+        deadlines in the sampler, rather than played back late in a burst.
+        """
+        while True:
+            try:
+                samples.put_nowait(metrics)
+                return
+            except queue.Full:
+                try:
+                    samples.get_nowait()
+                except queue.Empty:
+                    pass
+            
+    def close(self):
+        """Release the monitor sampling threads and file handles."""
+        self._pool.shutdown(wait=True)
+        self.cpu_monitor.close()
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        
+    def _samples_per_sound(self) -> int:
+        """Number of audio samples generated per system sample."""
+        return int(self.sound_engine.sample_rate * self.sound_duration)
+        
+    def _allocate_audio_buffer(self, duration: Optional[float]):
+        """Preallocate the recording buffer for a run of the given duration."""
+        samples_per_sound = self._samples_per_sound()
+        max_sounds = int(self.AUDIO_BUFFER_SECONDS / self.sound_duration)
+        if duration:
+            max_sounds = min(max_sounds, int(np.ceil(duration / self.sample_interval)) + 1)
+        self._audio_buf = np.empty(max(max_sounds, 1) * samples_per_sound, dtype=np.float32)
+        self._widx = 0
+        
+    def _reserve_audio(self, num_samples: int) -> np.ndarray:
+        """Return the next num_samples of the recording buffer, flushing it when full."""
+        if self._widx + num_samples > len(self._audio_buf):
+            self._flush_audio()
+        start = self._widx
+        self._widx = start + num_samples
+        return self._audio_buf[start:self._widx]
+        
+    def _flush_audio(self):
+        """Write the buffered audio to the output file and empty the buffer."""
+        if not self._widx:
+            return
+        if self._wav_file is None:
+            self._wav_file = self.sound_engine.open_audio(self._output_file)
+        self.sound_engine.write_audio(self._wav_file, self._audio_buf[:self._widx])
+        self._frames_written += self._widx
+        self._widx = 0
+        
     def _display_status(self, metrics: Dict[str, Any]):
         """Display current system status."""
         cpu = metrics["cpu_percent"]
@@ -178,11 +401,19 @@ class EchoTrace:
               
     def _create_bar(self, value: float, max_value: float, width: int = 10) -> str:
         """Create a simple ASCII bar chart."""
-        filled = int((value / max_value) * width)
-        return "█" * filled + "░" * (width - filled)
+        bars = self._bars.get(width)
+        if bars is None:
+            bars = ["█" * i + "░" * (width - i) for i in range(width + 1)]
+            self._bars[width] = bars
+        filled = int(value * width / max_value)
+        return bars[max(0, min(filled, width))]
+        
+    def generate_demo(self, output_file: Union[str, BinaryIO] = "echotrace_demo.wav"):
+        """
+        Generate a demo audio file showing healthy vs anomalous states.
         
-    def generate_demo(self, output_file: str = "echotrace_demo.wav"):
-        """Generate a demo audio file showing healthy vs anomalous states."""
+        output_file may be a path or a binary file object such as io.BytesIO.
+        """
         print("Generating demo audio...")
         demo_audio = self.sound_engine.generate_demo_sound()
         self.sound_engine.save_audio(demo_audio, output_file)
@@ -0,0 +1,152 @@
+"""
+Isolation Forest anomaly scoring for EchoTrace.
+
+Scores multivariate metric samples by how quickly random axis-parallel
+splits isolate them: anomalies are few and different, so they end up in
+short branches (Liu, Ting and Zhou, "Isolation Forest", ICDM 2008).
+"""
+
+import math
+import numpy as np
+from typing import Optional
+
+EULER_GAMMA = 0.5772156649
+
+
+def average_path_length(n: int) -> float:
+    """
+    Average path length c(n) of an unsuccessful search in a binary search tree of n points.
+    
+    Normalizes isolation depths for a subsample of n points, and estimates
+    the depth still needed to isolate the n points left in a leaf.
+    """
+    if n > 2:
+        return 2.0 * (math.log(n - 1.0) + EULER_GAMMA) - 2.0 * (n - 1.0) / n
+    return 1.0 if n == 2 else 0.0
+
+
+class IsolationForest:
+    """
+    Ensemble of isolation trees stored as flat per-node arrays.
+    
+    Node i of tree t splits on feature[t, i] at threshold[t, i], sending
+    samples below the threshold to children[t, i, 0] and the rest to
+    children[t, i, 1]. Leaves have feature -1, both children pointing back
+    at the leaf itself, and a depth[t, i] that already includes c(size) for
+    the training points they still hold.
+    """
+    
+    def __init__(self, n_trees: int = 20, sample_size: int = 64, seed: Optional[int] = None):
+        """
+        Initialize the forest.
+        
+        Args:
+            n_trees: Number of isolation trees
+            sample_size: Training points drawn (without replacement) per tree
+            seed: Seed for the random subsamples and splits
+        """
+        self.n_trees = n_trees
+        self.sample_size = sample_size
+        self._rng = np.random.default_rng(seed)
+        self._trees = np.arange(n_trees)
+        
+        self.feature = None
+        self.threshold = None
+        self.children = None
+        self.depth = None
+        self._next_node = None
+        self._height_limit = 0
+        self._c = 1.0
+        
+    @property
+    def fitted(self) -> bool:
+        """Whether fit has been called."""
+        return self.feature is not None
+        
+    def fit(self, X: np.ndarray) -> "IsolationForest":
+        """Build the trees from the rows of X (samples x features)."""
+        X = np.asarray(X, dtype=np.float32)
+        psi = min(self.sample_size, len(X))
+        if psi < 2:
+            raise ValueError("IsolationForest needs at least two samples to fit")
+            
+        # A tree over psi points has at most psi leaves; growth stops at
+        # the average tree height, beyond which only normal points remain
+        max_nodes = 2 * psi - 1
+        shape = (self.n_trees, max_nodes)
+        self.feature = np.full(shape, -1, dtype=np.int8)
+        self.threshold = np.zeros(shape, dtype=np.float32)
+        # Every node starts out as a leaf that loops back to itself
+        self.children = np.tile(np.arange(max_nodes, dtype=np.int32)[:, np.newaxis], (self.n_trees, 1, 2))
+        self.depth = np.zeros(shape, dtype=np.float32)
+        self._height_limit = math.ceil(math.log2(psi))
+        self._c = average_path_length(psi)
+        
+        for tree in range(self.n_trees):
+            sample = X[self._rng.choice(len(X), psi, replace=False)]
+            self._build_tree(tree, sample)
+            
+        # Children as flat indices into the raveled node arrays, so a walk
+        # step is a single gather
+        roots = self._trees * max_nodes
+        self._next_node = (self.children + roots[:, np.newaxis, np.newaxis]).ravel()
+        return self
+        
+    def _build_tree(self, tree: int, sample: np.ndarray):
+        """Grow one tree from its subsample, numbering nodes in creation order."""
+        feature = self.feature[tree]
+        threshold = self.threshold[tree]
+        children = self.children[tree]
+        depth = self.depth[tree]
+        
+        num_nodes = 1
+        pending = [(0, sample, 0)]
+        while pending:
+            node, points, level = pending.pop()
+            lo = points.min(axis=0)
+            hi = points.max(axis=0)
+            splittable = np.flatnonzero(hi > lo)
+            if level >= self._height_limit or not len(splittable):
+                depth[node] = level + average_path_length(len(points))
+                continue
+                
+            # Split a random non-constant feature at a uniform point; keeping
+            # the threshold in (lo, hi] guarantees both sides are non-empty
+            q = self._rng.choice(splittable)
+            split = max(np.float32(self._rng.uniform(lo[q], hi[q])), np.nextafter(lo[q], hi[q]))
+            below = points[:, q] < split
+            
+            feature[node] = q
+            threshold[node] = split
+            children[node] = (num_nodes, num_nodes + 1)
+            pending.append((num_nodes, points[below], level + 1))
+            pending.append((num_nodes + 1, points[~below], level + 1))
+            num_nodes += 2
+            
+    def score(self, x: np.ndarray) -> float:
+        """
+        Anomaly score s(x, n) = 2^(-E[h(x)] / c(n)) of one sample.
+        
+        Scores near 1 mark anomalies; scores of 0.5 or below mean the sample
+        is not distinctly different from the training data.
+        """
+        return float(self.score_samples(np.asarray(x)[np.newaxis])[0])
+        
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Anomaly scores of the rows of X (samples x features), as in score."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        
+        # Walk every point down every tree at once, one level per step.
+        # The comparison picks the child directly, and leaves loop back to
+        # themselves, so every point takes the same fixed number of steps
+        # with no masking.
+        feature = self.feature.ravel()
+        threshold = self.threshold.ravel()
+        node = np.broadcast_to(self._trees * self.feature.shape[1], (len(X), self.n_trees))
+        for _ in range(self._height_limit):
+            above = X[rows, feature[node]] >= threshold[node]
+            node = self._next_node[2 * node + above]
+            
+        mean_depth = self.depth.ravel()[node].mean(axis=1)
+        return 2.0 ** (-mean_depth / self._c)
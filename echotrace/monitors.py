@@ -4,46 +4,120 @@ System monitoring modules for EchoTrace.
 Monitors various system behaviors including CPU, network, sensors, and timing.
 """
 
+import math
+import os
 import psutil
 import time
-from typing import Dict, Any, Optional
+import weakref
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
 from collections import deque
 
 
 class BaseMonitor:
     """Base class for all monitors."""
     
+    # Scalar metrics recorded in the history array, one record per update
+    history_dtype = np.dtype([("timestamp", "f8")])
+    # Number of recent samples considered by get_anomaly_score
+    anomaly_window = 10
+    
     def __init__(self, history_size: int = 100):
-        self.history = deque(maxlen=history_size)
+        self.history_size = history_size
         self.last_value = None
+        self._hist = np.zeros(history_size, dtype=self.history_dtype)
+        self._idx = 0
+        self._count = 0
+        
+    @property
+    def history(self) -> np.ndarray:
+        """Recorded samples as a structured array, oldest first."""
+        if self._count < self.history_size:
+            return self._hist[:self._count].copy()
+        return np.concatenate((self._hist[self._idx:], self._hist[:self._idx]))
+        
+    def _window_stats(self, name: str) -> Tuple[float, float]:
+        """
+        Mean and population standard deviation of the last anomaly_window values of a field.
+        
+        Values are taken as stored, at the precision of the history array,
+        and summed with math.fsum so the result depends only on the values
+        in the window. NaN and infinite readings count as zero.
+        """
+        n = min(self.anomaly_window, self._count)
+        if not n:
+            return 0.0, 0.0
+        column = self._hist[name]
+        if n <= self._idx:
+            values = column[self._idx - n:self._idx].tolist()
+        else:
+            values = column[self._idx - n:].tolist() + column[:self._idx].tolist()
+        values = [v if math.isfinite(v) else 0.0 for v in values]
         
-    def get_metrics(self) -> Dict[str, Any]:
-        """Get current metrics from the monitor."""
+        mean = math.fsum(values) / n
+        variance = math.fsum([(v - mean) ** 2 for v in values]) / n
+        return mean, math.sqrt(variance)
+        
+    def get_metrics(self, now_ns: Optional[int] = None,
+                    timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Get current metrics from the monitor.
+        
+        Args:
+            now_ns: Sample time from time.monotonic_ns(), used for rates and
+                intervals; read from the clock if not given
+            timestamp: Wall-clock time from time.time() that labels the
+                sample; read from the clock if not given
+        """
         raise NotImplementedError
         
-    def update(self):
+    def update(self, now_ns: Optional[int] = None, timestamp: Optional[float] = None):
         """Update monitor state and store in history."""
-        metrics = self.get_metrics()
-        self.history.append(metrics)
+        # Subclasses written before get_metrics took a sample time still work
+        # as long as no sample time is passed in
+        if now_ns is None and timestamp is None:
+            metrics = self.get_metrics()
+        else:
+            metrics = self.get_metrics(now_ns, timestamp)
         self.last_value = metrics
+        
+        # Fields missing from the metrics are recorded as zero
+        self._hist[self._idx] = tuple(metrics.get(name, 0) for name in self.history_dtype.names)
+        self._idx = (self._idx + 1) % self.history_size
+        self._count = min(self._count + 1, self.history_size)
         return metrics
+        
+    def close(self):
+        """Release any resources held by the monitor."""
 
 
 class CPUMonitor(BaseMonitor):
     """Monitor CPU usage patterns."""
     
+    history_dtype = np.dtype([
+        ("cpu_percent", "f4"),
+        ("load_avg", "f4"),
+        ("timestamp", "f8"),
+    ])
+    
     def __init__(self, history_size: int = 100):
         super().__init__(history_size)
+        # The CPU count is static, so read it once
+        self.cpu_count = psutil.cpu_count()
         # Initialize to get baseline
-        psutil.cpu_percent(interval=None)
-        
-    def get_metrics(self) -> Dict[str, Any]:
-        """Get CPU metrics including usage percentage and load average."""
-        cpu_percent = psutil.cpu_percent(interval=None)
-        cpu_count = psutil.cpu_count()
+        psutil.cpu_percent(interval=None, percpu=True)
         
-        # Get per-CPU percentages
+    def _read_cpu_percent(self) -> Tuple[float, List[float]]:
+        """Return total and per-CPU utilization since the previous call."""
+        # Get per-CPU percentages and derive the total from them, so the
+        # CPU times are only read once per sample
         per_cpu = psutil.cpu_percent(interval=None, percpu=True)
+        return float(np.mean(per_cpu)), per_cpu
+        
+    def get_metrics(self, now_ns: Optional[int] = None,
+                    timestamp: Optional[float] = None) -> Dict[str, Any]:
+        """Get CPU metrics including usage percentage and load average."""
+        cpu_percent, per_cpu = self._read_cpu_percent()
         
         # Get load average (Unix-like systems)
         try:
@@ -53,53 +127,136 @@ class CPUMonitor(BaseMonitor):
             
         return {
             "cpu_percent": cpu_percent,
-            "cpu_count": cpu_count,
+            "cpu_count": self.cpu_count,
             "per_cpu": per_cpu,
             "load_avg": load_avg,
-            "timestamp": time.time()
+            "timestamp": time.time() if timestamp is None else timestamp
         }
         
     def get_anomaly_score(self) -> float:
         """Calculate anomaly score based on CPU patterns."""
-        if len(self.history) < 10:
+        if self._count < self.anomaly_window:
             return 0.0
             
-        recent_values = [m["cpu_percent"] for m in list(self.history)[-10:]]
-        avg = sum(recent_values) / len(recent_values)
-        
         # High variance or sudden spikes indicate anomalies
-        variance = sum((x - avg) ** 2 for x in recent_values) / len(recent_values)
-        std_dev = variance ** 0.5
+        _, std_dev = self._window_stats("cpu_percent")
         
         # Normalize to 0-1 range
         anomaly = min(std_dev / 50.0, 1.0)
         return anomaly
 
 
+class FastCPUMonitor(CPUMonitor):
+    """
+    CPU monitor that reads /proc/stat directly on Linux.
+    
+    Keeps /proc/stat open and re-reads only its leading "cpu" lines on each
+    sample, avoiding psutil's per-call parsing. Falls back to CPUMonitor
+    behavior on systems without /proc/stat.
+    """
+    
+    # Upper bound on the length of one "cpu" line: label plus ten counters
+    STAT_LINE_BYTES = 256
+    
+    def __init__(self, history_size: int = 100):
+        super().__init__(history_size)
+        try:
+            self._stat_fd = os.open("/proc/stat", os.O_RDONLY)
+        except OSError:
+            self._stat_fd = None
+        else:
+            # The handle is closed with the monitor if close() is never called
+            self._close_stat = weakref.finalize(self, os.close, self._stat_fd)
+            self._read_size = self.STAT_LINE_BYTES * ((self.cpu_count or 1) + 1)
+            self._last_times = self._read_cpu_times()
+            if not self._last_times:
+                # Unrecognized /proc/stat layout; use psutil instead
+                self.close()
+            
+    def close(self):
+        """Close the /proc/stat handle."""
+        if self._stat_fd is not None:
+            self._close_stat()
+            self._stat_fd = None
+            
+    def _read_cpu_times(self) -> List[Tuple[int, int]]:
+        """
+        Read busy and total CPU time from /proc/stat.
+        
+        Returns (busy, total) jiffies for the aggregate "cpu" line followed
+        by one entry per CPU.
+        """
+        data = os.pread(self._stat_fd, self._read_size, 0)
+        times = []
+        for line in data.split(b"\n"):
+            fields = line.split()
+            if len(fields) < 9 or not fields[0].startswith(b"cpu"):
+                break
+            # user, nice, system, idle, iowait, irq, softirq, steal; guest
+            # time is already included in user and nice
+            counters = list(map(int, fields[1:9]))
+            total = sum(counters)
+            times.append((total - counters[3] - counters[4], total))
+        return times
+        
+    def _read_cpu_percent(self) -> Tuple[float, List[float]]:
+        """Return total and per-CPU utilization since the previous call."""
+        if self._stat_fd is None:
+            return super()._read_cpu_percent()
+            
+        times = self._read_cpu_times()
+        if len(times) != len(self._last_times):
+            # CPUs went on- or offline; start a new baseline
+            self._last_times = times
+            
+        percent = []
+        for (busy, total), (last_busy, last_total) in zip(times, self._last_times):
+            elapsed = total - last_total
+            if elapsed > 0:
+                percent.append(min(max(round(100.0 * (busy - last_busy) / elapsed, 1), 0.0), 100.0))
+            else:
+                percent.append(0.0)
+        self._last_times = times
+        return percent[0], percent[1:]
+
+
 class NetworkMonitor(BaseMonitor):
     """Monitor network traffic patterns."""
     
+    history_dtype = np.dtype([
+        ("bytes_sent_rate", "f4"),
+        ("bytes_recv_rate", "f4"),
+        ("packets_sent_rate", "f4"),
+        ("packets_recv_rate", "f4"),
+        ("total_bytes_rate", "f4"),
+        ("timestamp", "f8"),
+    ])
+    
     def __init__(self, history_size: int = 100):
         super().__init__(history_size)
         self.last_net_io = psutil.net_io_counters()
-        self.last_time = time.time()
+        self.last_ns = time.monotonic_ns()
         
-    def get_metrics(self) -> Dict[str, Any]:
+    def get_metrics(self, now_ns: Optional[int] = None,
+                    timestamp: Optional[float] = None) -> Dict[str, Any]:
         """Get network metrics including bytes sent/received and packet rates."""
         current_io = psutil.net_io_counters()
-        current_time = time.time()
-        time_delta = current_time - self.last_time
-        
-        if time_delta > 0:
-            bytes_sent_rate = (current_io.bytes_sent - self.last_net_io.bytes_sent) / time_delta
-            bytes_recv_rate = (current_io.bytes_recv - self.last_net_io.bytes_recv) / time_delta
-            packets_sent_rate = (current_io.packets_sent - self.last_net_io.packets_sent) / time_delta
-            packets_recv_rate = (current_io.packets_recv - self.last_net_io.packets_recv) / time_delta
+        current_ns = time.monotonic_ns() if now_ns is None else now_ns
+        elapsed_ns = current_ns - self.last_ns
+        
+        if elapsed_ns > 0:
+            # Counter deltas are exact integers; scale them by one factor
+            # computed from the integer elapsed time
+            per_second = 1e9 / elapsed_ns
+            bytes_sent_rate = (current_io.bytes_sent - self.last_net_io.bytes_sent) * per_second
+            bytes_recv_rate = (current_io.bytes_recv - self.last_net_io.bytes_recv) * per_second
+            packets_sent_rate = (current_io.packets_sent - self.last_net_io.packets_sent) * per_second
+            packets_recv_rate = (current_io.packets_recv - self.last_net_io.packets_recv) * per_second
         else:
             bytes_sent_rate = bytes_recv_rate = packets_sent_rate = packets_recv_rate = 0
             
         self.last_net_io = current_io
-        self.last_time = current_time
+        self.last_ns = current_ns
         
         return {
             "bytes_sent_rate": bytes_sent_rate,
@@ -107,23 +264,20 @@ class NetworkMonitor(BaseMonitor):
             "packets_sent_rate": packets_sent_rate,
             "packets_recv_rate": packets_recv_rate,
             "total_bytes_rate": bytes_sent_rate + bytes_recv_rate,
-            "timestamp": current_time
+            "timestamp": time.time() if timestamp is None else timestamp
         }
         
     def get_anomaly_score(self) -> float:
         """Calculate anomaly score based on network patterns."""
-        if len(self.history) < 10:
+        if self._count < self.anomaly_window:
             return 0.0
             
-        recent_values = [m["total_bytes_rate"] for m in list(self.history)[-10:]]
-        avg = sum(recent_values) / len(recent_values)
+        avg, std_dev = self._window_stats("total_bytes_rate")
         
         if avg == 0:
             return 0.0
             
         # Calculate coefficient of variation
-        variance = sum((x - avg) ** 2 for x in recent_values) / len(recent_values)
-        std_dev = variance ** 0.5
         cv = std_dev / (avg + 1e-6)  # Avoid division by zero
         
         # Normalize to 0-1 range
@@ -134,37 +288,54 @@ class NetworkMonitor(BaseMonitor):
 class SensorMonitor(BaseMonitor):
     """Monitor system sensors like temperature and disk I/O."""
     
+    history_dtype = np.dtype([
+        ("disk_read_rate", "f4"),
+        ("disk_write_rate", "f4"),
+        ("disk_rate", "f4"),
+        ("memory_percent", "f4"),
+        ("memory_available", "i8"),
+        ("timestamp", "f8"),
+    ])
+    
     def __init__(self, history_size: int = 100):
         super().__init__(history_size)
         self.last_disk_io = psutil.disk_io_counters()
-        self.last_time = time.time()
+        self.last_ns = time.monotonic_ns()
+        # Cleared once the platform shows it has no temperature sensors;
+        # sensors_temperatures() is the slowest psutil call made per sample
+        self._has_temperatures = True
         
-    def get_metrics(self) -> Dict[str, Any]:
+    def get_metrics(self, now_ns: Optional[int] = None,
+                    timestamp: Optional[float] = None) -> Dict[str, Any]:
         """Get sensor metrics including temperature and disk I/O."""
-        current_time = time.time()
+        current_ns = time.monotonic_ns() if now_ns is None else now_ns
         
         # Temperature sensors (if available)
         temps = {}
-        try:
-            sensors = psutil.sensors_temperatures()
+        if self._has_temperatures:
+            try:
+                sensors = psutil.sensors_temperatures()
+            except (AttributeError, OSError):
+                sensors = None
             if sensors:
                 for name, entries in sensors.items():
                     temps[name] = [entry.current for entry in entries]
-        except (AttributeError, OSError):
-            pass
+            else:
+                self._has_temperatures = False
             
         # Disk I/O
         current_disk_io = psutil.disk_io_counters()
-        time_delta = current_time - self.last_time
+        elapsed_ns = current_ns - self.last_ns
         
-        if time_delta > 0 and self.last_disk_io:
-            read_rate = (current_disk_io.read_bytes - self.last_disk_io.read_bytes) / time_delta
-            write_rate = (current_disk_io.write_bytes - self.last_disk_io.write_bytes) / time_delta
+        if elapsed_ns > 0 and self.last_disk_io:
+            per_second = 1e9 / elapsed_ns
+            read_rate = (current_disk_io.read_bytes - self.last_disk_io.read_bytes) * per_second
+            write_rate = (current_disk_io.write_bytes - self.last_disk_io.write_bytes) * per_second
         else:
             read_rate = write_rate = 0
             
         self.last_disk_io = current_disk_io
-        self.last_time = current_time
+        self.last_ns = current_ns
         
         # Memory usage
         memory = psutil.virtual_memory()
@@ -173,29 +344,26 @@ class SensorMonitor(BaseMonitor):
             "temperatures": temps,
             "disk_read_rate": read_rate,
             "disk_write_rate": write_rate,
+            "disk_rate": read_rate + write_rate,
             "memory_percent": memory.percent,
             "memory_available": memory.available,
-            "timestamp": current_time
+            "timestamp": time.time() if timestamp is None else timestamp
         }
         
     def get_anomaly_score(self) -> float:
         """Calculate anomaly score based on sensor patterns."""
-        if len(self.history) < 10:
+        if self._count < self.anomaly_window:
             return 0.0
             
-        recent_memory = [m["memory_percent"] for m in list(self.history)[-10:]]
-        avg_memory = sum(recent_memory) / len(recent_memory)
+        avg_memory, _ = self._window_stats("memory_percent")
         
         # High memory usage indicates potential issues
         memory_score = avg_memory / 100.0
         
         # Check for rapid changes in disk I/O
-        recent_disk = [m["disk_read_rate"] + m["disk_write_rate"] for m in list(self.history)[-10:]]
-        avg_disk = sum(recent_disk) / len(recent_disk)
+        avg_disk, std_dev = self._window_stats("disk_rate")
         
         if avg_disk > 0:
-            variance = sum((x - avg_disk) ** 2 for x in recent_disk) / len(recent_disk)
-            std_dev = variance ** 0.5
             disk_score = min(std_dev / (avg_disk + 1e-6), 1.0)
         else:
             disk_score = 0.0
@@ -208,45 +376,53 @@ class SensorMonitor(BaseMonitor):
 class TimingMonitor(BaseMonitor):
     """Monitor timing patterns and system response times."""
     
+    history_dtype = np.dtype([
+        ("interval", "f8"),
+        ("avg_interval", "f8"),
+        ("jitter", "f8"),
+        ("uptime", "f8"),
+        ("timestamp", "f8"),
+    ])
+    
     def __init__(self, history_size: int = 100):
         super().__init__(history_size)
-        self.start_time = time.time()
-        self.last_update_time = self.start_time
+        self.start_ns = time.monotonic_ns()
+        self.last_update_ns = self.start_ns
+        # Update intervals in integer nanoseconds
         self.update_intervals = deque(maxlen=50)
         
-    def get_metrics(self) -> Dict[str, Any]:
+    def get_metrics(self, now_ns: Optional[int] = None,
+                    timestamp: Optional[float] = None) -> Dict[str, Any]:
         """Get timing metrics including intervals and jitter."""
-        current_time = time.time()
-        interval = current_time - self.last_update_time
-        self.update_intervals.append(interval)
+        current_ns = time.monotonic_ns() if now_ns is None else now_ns
+        interval_ns = current_ns - self.last_update_ns
+        self.update_intervals.append(interval_ns)
         
         # Calculate jitter (variation in intervals)
         if len(self.update_intervals) > 1:
-            intervals = list(self.update_intervals)
-            avg_interval = sum(intervals) / len(intervals)
-            jitter = sum(abs(i - avg_interval) for i in intervals) / len(intervals)
+            intervals = self.update_intervals
+            avg_interval_ns = sum(intervals) / len(intervals)
+            jitter_ns = sum(abs(i - avg_interval_ns) for i in intervals) / len(intervals)
         else:
-            avg_interval = interval
-            jitter = 0.0
+            avg_interval_ns = interval_ns
+            jitter_ns = 0.0
             
-        self.last_update_time = current_time
-        uptime = current_time - self.start_time
+        self.last_update_ns = current_ns
         
         return {
-            "interval": interval,
-            "avg_interval": avg_interval,
-            "jitter": jitter,
-            "uptime": uptime,
-            "timestamp": current_time
+            "interval": interval_ns / 1e9,
+            "avg_interval": avg_interval_ns / 1e9,
+            "jitter": jitter_ns / 1e9,
+            "uptime": (current_ns - self.start_ns) / 1e9,
+            "timestamp": time.time() if timestamp is None else timestamp
         }
         
     def get_anomaly_score(self) -> float:
         """Calculate anomaly score based on timing patterns."""
-        if len(self.history) < 10:
+        if self._count < self.anomaly_window:
             return 0.0
             
-        recent_jitter = [m["jitter"] for m in list(self.history)[-10:]]
-        avg_jitter = sum(recent_jitter) / len(recent_jitter)
+        avg_jitter, _ = self._window_stats("jitter")
         
         # Higher jitter indicates timing anomalies
         # Normalize to 0-1 range (assuming max jitter of 1 second)
@@ -7,7 +7,28 @@ Converts system metrics into sound signatures using audio synthesis.
 import numpy as np
 import wave
 import time
-from typing import Dict, Any
+from collections import OrderedDict
+from typing import Dict, Any, BinaryIO, Optional, Union
+
+
+class _LRUCache(OrderedDict):
+    """Dict that keeps only its maxsize most recently used entries."""
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+        
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
 
 
 class SoundEngine:
@@ -21,60 +42,164 @@ class SoundEngine:
     - Anomalies -> Dissonance/irregular patterns
     """
     
+    # Number of distinct sound lengths whose tables and buffers are kept
+    CACHED_LENGTHS = 8
+    
     def __init__(self, sample_rate: int = 22050, channels: int = 1):
         self.sample_rate = sample_rate
         self.channels = channels
         self.base_frequency = 440.0  # A4 note
         
-    def generate_tone(self, frequency: float, duration: float, amplitude: float = 0.3) -> np.ndarray:
+        # Per-length caches; sample_rate is fixed so these never go stale.
+        # They are bounded so that callers using many different durations
+        # do not keep a set of buffers alive for every one of them.
+        self._sample_indices: Dict[int, np.ndarray] = _LRUCache(self.CACHED_LENGTHS)
+        self._envelopes: Dict[int, np.ndarray] = _LRUCache(self.CACHED_LENGTHS)
+        self._scratch_buffers: Dict[int, Dict[str, np.ndarray]] = _LRUCache(self.CACHED_LENGTHS)
+        # SFC64 is a small-state generator like xoshiro; it fills float32
+        # noise buffers faster than the default PCG64
+        self._rng = np.random.Generator(np.random.SFC64())
+        
+    def prepare(self, duration: float):
+        """Precompute the cached tables and buffers used for sounds of the given duration."""
+        num_samples = int(self.sample_rate * duration)
+        self._sample_index(num_samples)
+        self._envelope(num_samples)
+        self._scratch(num_samples)
+        
+    def _sample_index(self, num_samples: int) -> np.ndarray:
+        """Return the cached float64 sample numbers 0..num_samples-1."""
+        index = self._sample_indices.get(num_samples)
+        if index is None:
+            index = np.arange(num_samples, dtype=np.float64)
+            index.flags.writeable = False
+            self._sample_indices[num_samples] = index
+        return index
+        
+    def _envelope(self, num_samples: int) -> np.ndarray:
+        """Return the cached fade-in/fade-out envelope for num_samples."""
+        envelope = self._envelopes.get(num_samples)
+        if envelope is None:
+            envelope = np.ones(num_samples, dtype=np.float32)
+            fade_samples = int(self.sample_rate * 0.01)  # 10ms fade
+            if num_samples > 2 * fade_samples:
+                ramp = np.linspace(0, 1, fade_samples, dtype=np.float32)
+                envelope[:fade_samples] = ramp
+                envelope[-fade_samples:] = ramp[::-1]
+            envelope.flags.writeable = False
+            self._envelopes[num_samples] = envelope
+        return envelope
+        
+    def _scratch(self, num_samples: int) -> Dict[str, np.ndarray]:
+        """
+        Return the reusable work buffers for num_samples.
+        
+        - component: a sound being mixed into the output of metrics_to_sound
+        - modulation: the pulse envelope of generate_pulse
+        - cycles, whole_cycles: float64 phase reduction in _sine
+        """
+        scratch = self._scratch_buffers.get(num_samples)
+        if scratch is None:
+            scratch = {
+                "component": np.empty(num_samples, dtype=np.float32),
+                "modulation": np.empty(num_samples, dtype=np.float32),
+                "cycles": np.empty(num_samples, dtype=np.float64),
+                "whole_cycles": np.empty(num_samples, dtype=np.float64),
+            }
+            self._scratch_buffers[num_samples] = scratch
+        return scratch
+        
+    def _sine(self, frequency, num_samples: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Unit-amplitude sine wave, evaluated in place in out if given.
+        
+        An array of frequencies yields one row per frequency.
+        
+        The phase is counted in cycles and reduced to the nearest whole
+        cycle in float64, so only a phase within half a cycle of zero is
+        rounded to float32; a float32 phase of 2*pi*f*t would lose
+        precision in proportion to the length of the buffer.
+        """
+        index = self._sample_index(num_samples)
+        if np.ndim(frequency) == 0:
+            scratch = self._scratch(num_samples)
+            cycles = np.multiply(index, frequency / self.sample_rate, out=scratch["cycles"])
+            whole_cycles = np.rint(cycles, out=scratch["whole_cycles"])
+        else:
+            cycles = np.multiply.outer(np.asarray(frequency, dtype=np.float64) / self.sample_rate, index)
+            whole_cycles = np.rint(cycles)
+        np.subtract(cycles, whole_cycles, out=cycles)
+        
+        if out is None:
+            out = np.empty(cycles.shape, dtype=np.float32)
+        phase = np.multiply(cycles, 2 * np.pi, out=out, casting='same_kind')
+        return np.sin(phase, out=phase)
+        
+    def generate_tone(self, frequency: float, duration: float, amplitude: float = 0.3,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
         """Generate a pure tone at given frequency."""
         num_samples = int(self.sample_rate * duration)
-        t = np.linspace(0, duration, num_samples, False)
         
         # Generate sine wave
-        tone = amplitude * np.sin(2 * np.pi * frequency * t)
+        tone = self._sine(frequency, num_samples, out=out)
+        tone *= amplitude
         
         # Apply envelope to avoid clicks
-        envelope = np.ones(num_samples)
-        fade_samples = int(self.sample_rate * 0.01)  # 10ms fade
-        if num_samples > 2 * fade_samples:
-            envelope[:fade_samples] = np.linspace(0, 1, fade_samples)
-            envelope[-fade_samples:] = np.linspace(1, 0, fade_samples)
-        
-        return tone * envelope
+        tone *= self._envelope(num_samples)
+        return tone
         
     def generate_chord(self, base_freq: float, duration: float, 
-                      intervals: list = [1.0, 1.25, 1.5], amplitude: float = 0.2) -> np.ndarray:
+                      intervals: list = [1.0, 1.25, 1.5], amplitude: float = 0.2,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
         """Generate a chord with multiple frequencies."""
-        chord = np.zeros(int(self.sample_rate * duration))
-        
-        for interval in intervals:
-            freq = base_freq * interval
-            tone = self.generate_tone(freq, duration, amplitude / len(intervals))
-            chord += tone
+        num_samples = int(self.sample_rate * duration)
+        if out is None:
+            out = np.empty(num_samples, dtype=np.float32)
+        if not intervals:
+            out.fill(0)
+            return out
             
+        # Evaluate every partial in one table lookup and sum the rows
+        freqs = base_freq * np.asarray(intervals, dtype=np.float64)
+        chord = self._sine(freqs, num_samples).sum(axis=0, out=out)
+        chord *= amplitude / len(intervals)
+        chord *= self._envelope(num_samples)
         return chord
         
     def generate_pulse(self, frequency: float, pulse_rate: float, duration: float, 
-                      amplitude: float = 0.3) -> np.ndarray:
+                      amplitude: float = 0.3, out: Optional[np.ndarray] = None) -> np.ndarray:
         """Generate a pulsing tone with rhythm."""
         num_samples = int(self.sample_rate * duration)
-        t = np.linspace(0, duration, num_samples, False)
         
         # Carrier wave
-        carrier = np.sin(2 * np.pi * frequency * t)
+        carrier = self._sine(frequency, num_samples, out=out)
         
-        # Modulation for pulse effect
-        pulse = (1 + np.sin(2 * np.pi * pulse_rate * t)) / 2
+        # Modulation for pulse effect, with the amplitude folded in:
+        # amplitude * (1 + sin) / 2
+        pulse = self._sine(pulse_rate, num_samples, out=self._scratch(num_samples)["modulation"])
+        pulse *= 0.5 * amplitude
+        pulse += 0.5 * amplitude
         
-        return amplitude * carrier * pulse
+        carrier *= pulse
+        return carrier
         
-    def generate_noise(self, duration: float, amplitude: float = 0.1) -> np.ndarray:
+    def generate_noise(self, duration: float, amplitude: float = 0.1,
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
         """Generate white noise for anomaly indication."""
         num_samples = int(self.sample_rate * duration)
-        return amplitude * np.random.uniform(-1, 1, num_samples)
+        if out is None:
+            out = np.empty(num_samples, dtype=np.float32)
+        return self._noise(amplitude, out=out)
+        
+    def _noise(self, amplitude: float, out: np.ndarray) -> np.ndarray:
+        """Fill out with uniform noise in [-amplitude, amplitude)."""
+        self._rng.random(dtype=np.float32, out=out)
+        out *= 2 * amplitude
+        out -= amplitude
+        return out
         
-    def metrics_to_sound(self, metrics: Dict[str, Any], duration: float = 0.1) -> np.ndarray:
+    def metrics_to_sound(self, metrics: Dict[str, Any], duration: float = 0.1,
+                         out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Convert system metrics to audio signal.
         
@@ -83,6 +208,9 @@ class SoundEngine:
         - Network rate: Controls pulse/rhythm rate (0-10 Hz)
         - Memory usage: Controls amplitude (0.1-0.5)
         - Anomaly score: Adds dissonance/noise
+        
+        If out is given, the sound is written into it and it is returned;
+        it must be a float32 array of int(sample_rate * duration) samples.
         """
         cpu_percent = metrics.get("cpu_percent", 50.0)
         network_rate = metrics.get("network_rate", 0.0)
@@ -100,77 +228,123 @@ class SoundEngine:
         # Map memory to amplitude (0.1-0.5)
         amplitude = 0.1 + (memory_percent / 100.0) * 0.4
         
+        # All components are accumulated in place into one output buffer,
+        # using a reusable scratch buffer for the component being added
+        num_samples = int(self.sample_rate * duration)
+        component = self._scratch(num_samples)["component"]
+        
+        # Every component stays within its own amplitude, so the sum of the
+        # amplitudes bounds the peak of the mix
+        peak_bound = amplitude
+        
         # Generate base sound
         if network_rate > 100:  # If there's network activity
-            sound = self.generate_pulse(base_freq, pulse_rate, duration, amplitude)
+            sound = self.generate_pulse(base_freq, pulse_rate, duration, amplitude, out=out)
         else:
-            sound = self.generate_tone(base_freq, duration, amplitude)
+            sound = self.generate_tone(base_freq, duration, amplitude, out=out)
             
         # Add dissonance for anomalies
         if anomaly_score > 0.3:
             # Add a dissonant frequency (tritone interval)
             dissonant_freq = base_freq * 1.414  # sqrt(2) - tritone
-            dissonance = self.generate_tone(dissonant_freq, duration, amplitude * anomaly_score * 0.5)
-            sound = sound + dissonance
+            dissonance_amplitude = amplitude * anomaly_score * 0.5
+            sound += self.generate_tone(dissonant_freq, duration, dissonance_amplitude,
+                                        out=component)
+            peak_bound += dissonance_amplitude
             
         # Add noise for high anomalies
         if anomaly_score > 0.6:
-            noise = self.generate_noise(duration, amplitude * anomaly_score * 0.3)
-            sound = sound + noise
+            noise_amplitude = amplitude * anomaly_score * 0.3
+            sound += self.generate_noise(duration, noise_amplitude, out=component)
+            peak_bound += noise_amplitude
             
-        # Normalize to prevent clipping
-        max_val = np.max(np.abs(sound))
-        if max_val > 1.0:
-            sound = sound / max_val
+        # Normalize to prevent clipping; the peak only needs measuring when
+        # the bound says the mix could exceed full scale
+        if peak_bound > 1.0:
+            max_val = np.max(np.abs(sound))
+            if max_val > 1.0:
+                sound /= max_val
             
         return sound
         
-    def save_audio(self, audio_data: np.ndarray, filename: str):
-        """Save audio data to WAV file."""
-        # Convert to 16-bit PCM
-        audio_int = np.int16(audio_data * 32767)
+    def open_audio(self, filename: Union[str, BinaryIO]) -> wave.Wave_write:
+        """
+        Open a 16-bit PCM WAV file for writing with write_audio.
+        
+        filename may also be a seekable binary file object such as
+        io.BytesIO; it is left open when the WAV writer is closed.
+        """
+        wav_file = wave.open(filename, 'w')
+        wav_file.setnchannels(self.channels)
+        wav_file.setsampwidth(2)  # 16-bit
+        wav_file.setframerate(self.sample_rate)
+        return wav_file
+        
+    def write_audio(self, wav_file: wave.Wave_write, audio_data: np.ndarray):
+        """Append audio data to a WAV file opened with open_audio."""
+        audio_data = np.asarray(audio_data)
         
-        with wave.open(filename, 'w') as wav_file:
-            wav_file.setnchannels(self.channels)
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(self.sample_rate)
-            wav_file.writeframes(audio_int.tobytes())
+        # Convert to 16-bit PCM one second at a time, so peak memory stays
+        # bounded by the block size rather than the recording length
+        block_size = self.sample_rate * self.channels
+        clipped = np.empty(min(len(audio_data), block_size), dtype=np.float32)
+        audio_int = np.empty(len(clipped), dtype=np.int16)
+        
+        for start in range(0, len(audio_data), block_size):
+            block = audio_data[start:start + block_size]
+            n = len(block)
+            np.clip(block, -1.0, 1.0, out=clipped[:n], casting='unsafe')
+            np.multiply(clipped[:n], 32767, out=audio_int[:n], casting='unsafe')
+            wav_file.writeframes(audio_int[:n])
+            
+    def save_audio(self, audio_data: np.ndarray, filename: Union[str, BinaryIO]):
+        """Save audio data to WAV file, given as a path or a binary file object."""
+        with self.open_audio(filename) as wav_file:
+            self.write_audio(wav_file, audio_data)
             
     def generate_soundscape(self, metrics_list: list, duration_per_sample: float = 0.1) -> np.ndarray:
         """Generate a continuous soundscape from a list of metric samples."""
         if not metrics_list:
-            return np.array([])
+            return np.array([], dtype=np.float32)
             
-        sounds = []
-        for metrics in metrics_list:
-            sound = self.metrics_to_sound(metrics, duration_per_sample)
-            sounds.append(sound)
+        # Each sound is written straight into its slice of the output
+        num_samples = int(self.sample_rate * duration_per_sample)
+        soundscape = np.empty(len(metrics_list) * num_samples, dtype=np.float32)
+        for i, metrics in enumerate(metrics_list):
+            start = i * num_samples
+            self.metrics_to_sound(metrics, duration_per_sample,
+                                  out=soundscape[start:start + num_samples])
             
-        # Concatenate all sounds
-        soundscape = np.concatenate(sounds)
         return soundscape
         
     def generate_demo_sound(self) -> np.ndarray:
         """Generate a demo sound showing healthy vs anomalous system states."""
-        demo_metrics = []
-        
-        # Healthy system (10 samples)
-        for i in range(10):
-            demo_metrics.append({
-                "cpu_percent": 30.0 + np.random.uniform(-5, 5),
-                "network_rate": 1000000,  # 1 MB/s
-                "memory_percent": 40.0 + np.random.uniform(-3, 3),
-                "anomaly_score": 0.1
-            })
-            
-        # Transition to anomalous state (10 samples)
-        for i in range(10):
-            progress = i / 10.0
-            demo_metrics.append({
-                "cpu_percent": 30.0 + progress * 60.0 + np.random.uniform(-10, 10),
-                "network_rate": 1000000 * (1 + progress * 5),
-                "memory_percent": 40.0 + progress * 50.0,
-                "anomaly_score": progress * 0.8
-            })
-            
+        rng = self._rng
+        progress = np.arange(10) / 10.0
+        
+        # Healthy system (10 samples), then a transition to an anomalous
+        # state (10 samples); each metric is built as one column
+        cpu_percent = np.concatenate((
+            30.0 + rng.uniform(-5, 5, 10),
+            30.0 + progress * 60.0 + rng.uniform(-10, 10, 10),
+        ))
+        network_rate = np.concatenate((
+            np.full(10, 1000000.0),  # 1 MB/s
+            1000000 * (1 + progress * 5),
+        ))
+        memory_percent = np.concatenate((
+            40.0 + rng.uniform(-3, 3, 10),
+            40.0 + progress * 50.0,
+        ))
+        anomaly_score = np.concatenate((
+            np.full(10, 0.1),
+            progress * 0.8,
+        ))
+        
+        demo_metrics = [
+            {"cpu_percent": cpu, "network_rate": net, "memory_percent": mem, "anomaly_score": anomaly}
+            for cpu, net, mem, anomaly in zip(cpu_percent.tolist(), network_rate.tolist(),
+                                              memory_percent.tolist(), anomaly_score.tolist())
+        ]
+        
         return self.generate_soundscape(demo_metrics, duration_per_sample=0.2)
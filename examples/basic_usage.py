@@ -7,19 +7,19 @@ This script demonstrates how to use EchoTrace programmatically.
 from echotrace import EchoTrace
 
 def main():
-    # Create EchoTrace instance
-    echo = EchoTrace(
+    # Create EchoTrace instance; leaving the with block releases its
+    # sampling threads and file handles
+    with EchoTrace(
         sample_interval=0.1,  # Sample every 100ms
         sound_duration=0.1     # Each sound lasts 100ms
-    )
-    
-    # Option 1: Generate a demo
-    print("Generating demo audio...")
-    echo.generate_demo("demo_output.wav")
-    
-    # Option 2: Run live monitoring for 10 seconds
-    print("\nRunning live monitoring for 10 seconds...")
-    echo.run(duration=10, output_file="live_monitoring.wav")
+    ) as echo:
+        # Option 1: Generate a demo
+        print("Generating demo audio...")
+        echo.generate_demo("demo_output.wav")
+        
+        # Option 2: Run live monitoring for 10 seconds
+        print("\nRunning live monitoring for 10 seconds...")
+        echo.run(duration=10, output_file="live_monitoring.wav")
     
     print("\nDone! Check the generated WAV files.")
     print("- demo_output.wav: Shows healthy -> anomalous transition")
@@ -1,80 +1,169 @@
 """Tests for main EchoTrace application."""
 
-import os
-import tempfile
+import io
+import queue
+import threading
+import time
+import wave
+import numpy as np
 from echotrace import EchoTrace
 
 
 def test_echotrace_init():
     """Test EchoTrace initialization."""
-    echo = EchoTrace()
-    assert echo.sample_interval == 0.1
-    assert echo.sound_duration == 0.1
-    assert echo.cpu_monitor is not None
-    assert echo.network_monitor is not None
-    assert echo.sensor_monitor is not None
-    assert echo.timing_monitor is not None
-    assert echo.sound_engine is not None
+    with EchoTrace() as echo:
+        assert echo.sample_interval == 0.1
+        assert echo.sound_duration == 0.1
+        assert echo.cpu_monitor is not None
+        assert echo.network_monitor is not None
+        assert echo.sensor_monitor is not None
+        assert echo.timing_monitor is not None
+        assert echo.sound_engine is not None
 
 
 def test_collect_metrics():
     """Test collecting metrics from all monitors."""
-    echo = EchoTrace()
-    metrics = echo.collect_metrics()
-    
-    assert "cpu_percent" in metrics
-    assert "network_rate" in metrics
-    assert "memory_percent" in metrics
-    assert "anomaly_score" in metrics
-    assert "timestamp" in metrics
-    assert "details" in metrics
-    
-    # Check details
-    assert "cpu" in metrics["details"]
-    assert "network" in metrics["details"]
-    assert "sensor" in metrics["details"]
-    assert "timing" in metrics["details"]
-    assert "anomalies" in metrics["details"]
+    with EchoTrace() as echo:
+        metrics = echo.collect_metrics()
+        
+        assert "cpu_percent" in metrics
+        assert "network_rate" in metrics
+        assert "memory_percent" in metrics
+        assert "anomaly_score" in metrics
+        assert "timestamp" in metrics
+        assert "details" in metrics
+        
+        # Check details
+        assert "cpu" in metrics["details"]
+        assert "network" in metrics["details"]
+        assert "sensor" in metrics["details"]
+        assert "timing" in metrics["details"]
+        assert "anomalies" in metrics["details"]
+
+
+def test_collect_metrics_shares_timestamp():
+    """Test that all monitors are sampled at one shared time."""
+    with EchoTrace() as echo:
+        metrics = echo.collect_metrics()
+        
+        for name in ("cpu", "network", "sensor", "timing"):
+            assert metrics["details"][name]["timestamp"] == metrics["timestamp"]
+        
+        # Sample times taken by the caller are used as is
+        timestamp = time.time()
+        metrics = echo.collect_metrics(now_ns=time.monotonic_ns(), timestamp=timestamp)
+        assert metrics["timestamp"] == timestamp
+        assert metrics["details"]["timing"]["timestamp"] == metrics["timestamp"]
+
+
+def test_collect_metrics_without_details():
+    """Test that the details dict can be skipped."""
+    with EchoTrace() as echo:
+        metrics = echo.collect_metrics(details=False)
+        
+        assert "anomaly_score" in metrics
+        assert "details" not in metrics
+
+
+def test_anomaly_forest_warmup():
+    """Test that the forest takes over the anomaly score once trained."""
+    with EchoTrace() as echo:
+        for _ in range(echo.forest.sample_size):
+            assert not echo.forest.fitted
+            metrics = echo.collect_metrics(details=False)
+        assert echo.forest.fitted
+        
+        metrics = echo.collect_metrics()
+        assert 0 <= metrics["anomaly_score"] <= 1
+        
+        # The forest trains on the feature columns of the combined history
+        history = echo.history
+        assert len(history) == echo.forest.sample_size + 1
+        assert history["ts"][-1] == metrics["timestamp"]
+        assert history["cpu"][-1] == np.float32(metrics["cpu_percent"])
+        assert np.array_equal(echo._features[:len(history), 3], history["jitter"])
+        assert metrics["details"]["anomalies"]["overall"] == metrics["anomaly_score"]
+        assert "cpu" in metrics["details"]["anomalies"]
 
 
 def test_run_with_duration():
     """Test running EchoTrace with a duration limit."""
-    echo = EchoTrace(sample_interval=0.1)
-    
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        filename = f.name
-    
-    try:
+    with EchoTrace(sample_interval=0.1) as echo:
+        buffer = io.BytesIO()
+        
         # Run for 0.5 seconds
-        echo.run(duration=0.5, output_file=filename)
+        echo.run(duration=0.5, output_file=buffer)
         
-        # Check that file was created
-        assert os.path.exists(filename)
-        assert os.path.getsize(filename) > 0
+        # Check that audio was written
+        buffer.seek(0)
+        with wave.open(buffer, 'r') as wav_file:
+            assert wav_file.getnframes() == echo.sample_count * echo._samples_per_sound()
         
         # Check that samples were collected
         assert echo.sample_count > 0
-    finally:
-        if os.path.exists(filename):
-            os.remove(filename)
+        
+        # The sampler thread has finished
+        assert all(t.name != "echotrace-sampler" for t in threading.enumerate())
+
+
+def test_hand_off_drops_oldest():
+    """Test that a full sample queue drops its oldest samples."""
+    samples = queue.Queue(maxsize=2)
+    for i in range(4):
+        EchoTrace._hand_off(samples, {"sample": i})
+    EchoTrace._hand_off(samples, None)
+    
+    assert samples.get_nowait() == {"sample": 3}
+    assert samples.get_nowait() is None
+    assert samples.empty()
+
+
+def test_audio_buffer_flushes():
+    """Test that a full recording buffer is flushed to the output file."""
+    with EchoTrace() as echo:
+        echo.AUDIO_BUFFER_SECONDS = 0.2
+        buffer = io.BytesIO()
+        
+        echo._output_file = buffer
+        echo._allocate_audio_buffer(None)
+        capacity = len(echo._audio_buf)
+        
+        chunks = [np.full(echo._samples_per_sound(), i / 10, dtype=np.float32) for i in range(5)]
+        for chunk in chunks:
+            echo._reserve_audio(len(chunk))[:] = chunk
+        assert len(echo._audio_buf) == capacity
+        
+        echo._flush_audio()
+        echo._wav_file.close()
+        
+        buffer.seek(0)
+        with wave.open(buffer, 'r') as wav_file:
+            frames = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+        expected = (np.concatenate(chunks) * 32767).astype(np.int16)
+        assert np.array_equal(frames, expected)
+
+
+def test_create_bar():
+    """Test the ASCII bar chart is clamped to its width."""
+    with EchoTrace() as echo:
+        assert echo._create_bar(0, 100) == "░" * 10
+        assert echo._create_bar(55, 100) == "█" * 5 + "░" * 5
+        assert echo._create_bar(100, 100) == "█" * 10
+        assert echo._create_bar(250, 100) == "█" * 10
+        assert echo._create_bar(-5, 100) == "░" * 10
 
 
 def test_generate_demo():
     """Test generating demo audio."""
-    echo = EchoTrace()
-    
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-        filename = f.name
-    
-    try:
-        echo.generate_demo(filename)
+    with EchoTrace() as echo:
+        buffer = io.BytesIO()
+        
+        echo.generate_demo(buffer)
         
-        # Check that file was created
-        assert os.path.exists(filename)
-        assert os.path.getsize(filename) > 0
-    finally:
-        if os.path.exists(filename):
-            os.remove(filename)
+        # Check that audio was written
+        buffer.seek(0)
+        with wave.open(buffer, 'r') as wav_file:
+            assert wav_file.getnframes() > 0
 
 
 if __name__ == "__main__":
@@ -83,8 +172,20 @@ if __name__ == "__main__":
     print("✓ EchoTrace initialization test passed")
     test_collect_metrics()
     print("✓ Collect metrics test passed")
+    test_collect_metrics_shares_timestamp()
+    print("✓ Shared timestamp test passed")
+    test_collect_metrics_without_details()
+    print("✓ Collect metrics without details test passed")
+    test_anomaly_forest_warmup()
+    print("✓ Anomaly forest warmup test passed")
     test_run_with_duration()
     print("✓ Run with duration test passed")
+    test_hand_off_drops_oldest()
+    print("✓ Sample hand-off test passed")
+    test_audio_buffer_flushes()
+    print("✓ Audio buffer flush test passed")
+    test_create_bar()
+    print("✓ Create bar test passed")
     test_generate_demo()
     print("✓ Generate demo test passed")
     print("\nAll tests passed!")
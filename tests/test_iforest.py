@@ -0,0 +1,78 @@
+"""Tests for the Isolation Forest anomaly scorer."""
+
+import numpy as np
+from echotrace import IsolationForest
+from echotrace.iforest import average_path_length
+
+
+def test_average_path_length():
+    """Test the c(n) normalization against its closed form."""
+    assert average_path_length(1) == 0.0
+    assert average_path_length(2) == 1.0
+    expected = 2 * (np.log(255) + 0.5772156649) - 2 * 255 / 256
+    assert abs(average_path_length(256) - expected) < 1e-12
+
+
+def test_tree_structure():
+    """Test that every inner node splits its points between two children."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 4))
+    forest = IsolationForest(n_trees=5, sample_size=32, seed=0).fit(X)
+    
+    assert forest.fitted
+    assert forest.feature.shape == (5, 63)
+    for tree in range(5):
+        inner = np.flatnonzero(forest.feature[tree] >= 0)
+        children = forest.children[tree][inner].ravel()
+        # Every node except the root is the child of exactly one inner node
+        assert len(np.unique(children)) == len(children)
+        assert 0 not in children
+        
+        # Leaves loop back to themselves
+        leaves = np.flatnonzero(forest.feature[tree] < 0)
+        assert np.all(forest.children[tree][leaves] == leaves[:, np.newaxis])
+
+
+def test_outlier_scores_higher():
+    """Test that an isolated point scores as an anomaly and typical points do not."""
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(512, 4)).astype(np.float32)
+    forest = IsolationForest(seed=1).fit(X)
+    
+    outlier = forest.score([8.0, -8.0, 8.0, 8.0])
+    typical = forest.score([0.0, 0.0, 0.0, 0.0])
+    assert 0.0 < typical < 0.5 < outlier <= 1.0
+
+
+def test_score_samples_matches_score():
+    """Test that batch scoring agrees with scoring points one at a time."""
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(256, 4))
+    forest = IsolationForest(seed=3).fit(X)
+    
+    batch = forest.score_samples(X)
+    assert batch.shape == (256,)
+    assert np.allclose(batch, [forest.score(x) for x in X])
+
+
+def test_constant_features():
+    """Test fitting data with no spread, where every tree is a single leaf."""
+    forest = IsolationForest(n_trees=3, sample_size=16, seed=2).fit(np.ones((16, 4)))
+    
+    assert np.all(forest.feature[:, 0] == -1)
+    assert abs(forest.score([1.0, 1.0, 1.0, 1.0]) - 0.5) < 1e-6
+
+
+if __name__ == "__main__":
+    print("Running isolation forest tests...")
+    test_average_path_length()
+    print("✓ Average path length test passed")
+    test_tree_structure()
+    print("✓ Tree structure test passed")
+    test_outlier_scores_higher()
+    print("✓ Outlier score test passed")
+    test_score_samples_matches_score()
+    print("✓ Batch scoring test passed")
+    test_constant_features()
+    print("✓ Constant features test passed")
+    print("\nAll tests passed!")
@@ -1,7 +1,10 @@
 """Tests for system monitors."""
 
+import gc
 import time
-from echotrace import CPUMonitor, NetworkMonitor, SensorMonitor, TimingMonitor
+import numpy as np
+from echotrace import CPUMonitor, FastCPUMonitor, NetworkMonitor, SensorMonitor, TimingMonitor
+from echotrace.monitors import BaseMonitor
 
 
 def test_cpu_monitor():
@@ -17,6 +20,56 @@ def test_cpu_monitor():
     assert metrics["cpu_count"] > 0
 
 
+def test_fast_cpu_monitor():
+    """Test the /proc/stat CPU monitor and its psutil fallback."""
+    monitor = FastCPUMonitor()
+    time.sleep(0.05)
+    metrics = monitor.update()
+    
+    assert 0 <= metrics["cpu_percent"] <= 100
+    assert all(0 <= p <= 100 for p in metrics["per_cpu"])
+    assert metrics["cpu_count"] > 0
+    
+    # Without /proc/stat the monitor falls back to psutil
+    monitor.close()
+    metrics = monitor.update()
+    assert 0 <= metrics["cpu_percent"] <= 100
+
+
+def test_fast_cpu_monitor_releases_handle():
+    """Test that /proc/stat is closed when an unclosed monitor is collected."""
+    monitor = FastCPUMonitor()
+    if monitor._stat_fd is None:
+        return
+    close_stat = monitor._close_stat
+    
+    del monitor
+    gc.collect()
+    assert not close_stat.alive
+
+
+def test_fast_cpu_monitor_falls_back():
+    """Test that an unreadable /proc/stat layout falls back to psutil."""
+    class UnparsedCPUMonitor(FastCPUMonitor):
+        def _read_cpu_times(self):
+            return []
+            
+    monitor = UnparsedCPUMonitor()
+    assert monitor._stat_fd is None
+    
+    metrics = monitor.update()
+    assert 0 <= metrics["cpu_percent"] <= 100
+    assert len(metrics["per_cpu"]) == monitor.cpu_count
+    monitor.close()
+
+
+def test_monitors_close():
+    """Test that every monitor can be closed, whether or not it holds a handle."""
+    for monitor in (CPUMonitor(), FastCPUMonitor(), NetworkMonitor(), SensorMonitor(), TimingMonitor()):
+        monitor.close()
+        monitor.close()
+
+
 def test_network_monitor():
     """Test network monitor basic functionality."""
     monitor = NetworkMonitor()
@@ -92,10 +145,74 @@ def test_anomaly_scores():
     assert 0 <= timing_anomaly <= 1
 
 
+def scripted(monitor_cls, field, values, **kwargs):
+    """Return a monitor whose updates record the given values of one field."""
+    values = iter(values)
+    
+    class ScriptedMonitor(monitor_cls):
+        def get_metrics(self):
+            return {field: next(values), "timestamp": time.time()}
+    
+    return ScriptedMonitor(**kwargs)
+
+
+def test_anomaly_window_wraps():
+    """Test that the ring buffer window tracks the latest samples in order."""
+    cpu = scripted(CPUMonitor, "cpu_percent", (float(v) for v in range(15)), history_size=12)
+    for _ in range(15):
+        cpu.update()
+    
+    assert abs(cpu.get_anomaly_score() - np.std(np.arange(5, 15)) / 50.0) < 1e-6
+    assert np.array_equal(cpu.history["cpu_percent"], np.arange(3, 15, dtype=np.float32))
+
+
+def test_anomaly_score_after_spike():
+    """Test that a spike leaving the window leaves no residue in the score."""
+    network = scripted(NetworkMonitor, "total_bytes_rate", [1e9 + 0.5] + [3.0] * 10 + [0.0] * 10)
+    for _ in range(11):
+        network.update()
+    assert network.get_anomaly_score() == 0.0
+    
+    for _ in range(10):
+        network.update()
+    assert network.get_anomaly_score() == 0.0
+
+
+def test_anomaly_score_ignores_non_finite():
+    """Test that NaN and infinite readings do not break updates or scores."""
+    cpu = scripted(CPUMonitor, "cpu_percent", [float("nan"), float("inf")] + [10.0] * 8)
+    for _ in range(10):
+        cpu.update()
+    
+    # The bad readings count as zero in the window
+    expected = np.std([0.0, 0.0] + [10.0] * 8) / 50.0
+    assert abs(cpu.get_anomaly_score() - expected) < 1e-9
+
+
+def test_update_accepts_partial_metrics():
+    """Test that metrics missing history fields are still recorded."""
+    class CustomMonitor(BaseMonitor):
+        def get_metrics(self):
+            return {"value": 42}
+    
+    monitor = CustomMonitor()
+    assert monitor.update() == {"value": 42}
+    assert monitor.last_value == {"value": 42}
+    assert monitor.history["timestamp"][0] == 0
+
+
 if __name__ == "__main__":
     print("Running monitor tests...")
     test_cpu_monitor()
     print("✓ CPU monitor test passed")
+    test_fast_cpu_monitor()
+    print("✓ Fast CPU monitor test passed")
+    test_fast_cpu_monitor_releases_handle()
+    print("✓ Fast CPU monitor handle test passed")
+    test_fast_cpu_monitor_falls_back()
+    print("✓ Fast CPU monitor fallback test passed")
+    test_monitors_close()
+    print("✓ Monitor close test passed")
     test_network_monitor()
     print("✓ Network monitor test passed")
     test_sensor_monitor()
@@ -104,4 +221,12 @@ if __name__ == "__main__":
     print("✓ Timing monitor test passed")
     test_anomaly_scores()
     print("✓ Anomaly scores test passed")
+    test_anomaly_window_wraps()
+    print("✓ Anomaly window test passed")
+    test_anomaly_score_after_spike()
+    print("✓ Anomaly spike test passed")
+    test_anomaly_score_ignores_non_finite()
+    print("✓ Non-finite readings test passed")
+    test_update_accepts_partial_metrics()
+    print("✓ Partial metrics test passed")
     print("\nAll tests passed!")
@@ -1,8 +1,10 @@
 """Tests for sound engine."""
 
+import io
 import numpy as np
 import os
 import tempfile
+import wave
 from echotrace import SoundEngine
 
 
@@ -24,6 +26,68 @@ def test_generate_tone():
     assert np.max(np.abs(tone)) <= 1.0  # Should be normalized
 
 
+def test_generate_tone_matches_sine():
+    """Test that generated tones track an exact sine wave."""
+    engine = SoundEngine()
+    tone = engine.generate_tone(440.0, 0.1, 1.0)
+    
+    t = np.arange(len(tone)) / engine.sample_rate
+    expected = np.sin(2 * np.pi * 440.0 * t) * engine._envelope(len(tone))
+    assert np.max(np.abs(tone - expected)) < 1e-3
+
+
+def test_envelope_low_sample_rate():
+    """Test the envelope when the 10ms fade is a single sample."""
+    engine = SoundEngine(sample_rate=150)
+    tone = engine.generate_tone(10.0, 1.0, 1.0)
+    
+    assert np.all(np.isfinite(tone))
+    assert tone[0] == 0.0
+
+
+def test_long_tone_keeps_phase():
+    """Test that long tones and pulses stay within one 16-bit step of an exact sine."""
+    engine = SoundEngine()
+    duration = 60.0
+    t = np.arange(int(engine.sample_rate * duration)) / engine.sample_rate
+    
+    tone = engine.generate_tone(800.0, duration, 1.0)
+    expected = np.sin(2 * np.pi * 800.0 * t) * engine._envelope(len(tone))
+    assert np.max(np.abs(tone - expected)) < 1 / 32767
+    
+    pulse = engine.generate_pulse(800.0, 7.0, duration, 1.0)
+    expected = np.sin(2 * np.pi * 800.0 * t) * (1 + np.sin(2 * np.pi * 7.0 * t)) / 2
+    assert np.max(np.abs(pulse - expected)) < 1 / 32767
+
+
+def test_long_chord_keeps_phase():
+    """Test that every partial of a long chord tracks an exact sine."""
+    engine = SoundEngine()
+    duration = 60.0
+    intervals = [1.0, 1.25, 1.5]
+    t = np.arange(int(engine.sample_rate * duration)) / engine.sample_rate
+    
+    chord = engine.generate_chord(800.0, duration, intervals, 1.0)
+    expected = sum(np.sin(2 * np.pi * 800.0 * r * t) for r in intervals) / len(intervals)
+    expected *= engine._envelope(len(chord))
+    assert np.max(np.abs(chord - expected)) < 1 / 32767
+
+
+def test_caches_are_bounded():
+    """Test that sounds of many durations do not keep a buffer set for each."""
+    engine = SoundEngine()
+    durations = [0.01 * (i + 1) for i in range(50)]
+    for duration in durations:
+        engine.generate_pulse(440.0, 2.0, duration)
+    
+    for cache in (engine._sample_indices, engine._scratch_buffers):
+        assert len(cache) == engine.CACHED_LENGTHS
+    
+    # The most recently used lengths are the ones kept
+    assert int(engine.sample_rate * durations[-1]) in engine._sample_indices
+    assert int(engine.sample_rate * durations[0]) not in engine._sample_indices
+
+
 def test_generate_chord():
     """Test chord generation."""
     engine = SoundEngine()
@@ -44,6 +108,39 @@ def test_generate_pulse():
     assert np.max(np.abs(pulse)) <= 1.0
 
 
+def test_generators_write_into_buffer():
+    """Test that the generators fill a caller-provided buffer."""
+    engine = SoundEngine()
+    num_samples = int(engine.sample_rate * 0.1)
+    
+    for generate, args in [
+        (engine.generate_tone, (440.0, 0.1, 0.3)),
+        (engine.generate_chord, (440.0, 0.1, [1.0, 1.25, 1.5], 0.2)),
+        (engine.generate_pulse, (440.0, 5.0, 0.1, 0.3)),
+    ]:
+        out = np.empty(num_samples, dtype=np.float32)
+        assert generate(*args, out=out) is out
+        assert np.array_equal(out, generate(*args))
+
+
+def test_generators_return_float32():
+    """Test that every generator produces float32 audio."""
+    engine = SoundEngine()
+    metrics = {"cpu_percent": 80.0, "network_rate": 1000000, "memory_percent": 90.0, "anomaly_score": 0.9}
+    
+    outputs = [
+        engine.generate_tone(440.0, 0.1, 0.3),
+        engine.generate_chord(440.0, 0.1, [1.0, 1.25, 1.5], 0.2),
+        engine.generate_pulse(440.0, 5.0, 0.1, 0.3),
+        engine.generate_noise(0.1, 0.1),
+        engine.metrics_to_sound(metrics, 0.1),
+        engine.generate_soundscape([metrics, metrics], 0.1),
+        engine.generate_soundscape([], 0.1),
+    ]
+    for output in outputs:
+        assert output.dtype == np.float32
+
+
 def test_generate_noise():
     """Test noise generation."""
     engine = SoundEngine()
@@ -52,6 +149,8 @@ def test_generate_noise():
     assert isinstance(noise, np.ndarray)
     assert len(noise) == int(engine.sample_rate * 0.1)
     assert np.max(np.abs(noise)) <= 1.0
+    assert np.max(np.abs(noise)) <= 0.1
+    assert noise.dtype == np.float32
 
 
 def test_metrics_to_sound():
@@ -71,6 +170,36 @@ def test_metrics_to_sound():
     assert np.max(np.abs(sound)) <= 1.0
 
 
+def test_metrics_to_sound_anomalous():
+    """Test the dissonance and noise paths stay within range."""
+    engine = SoundEngine()
+    metrics = {
+        "cpu_percent": 95.0,
+        "network_rate": 50_000_000,
+        "memory_percent": 100.0,
+        "anomaly_score": 1.0
+    }
+    
+    sound = engine.metrics_to_sound(metrics, 0.1)
+    
+    assert sound.dtype == np.float32
+    assert len(sound) == int(engine.sample_rate * 0.1)
+    assert np.max(np.abs(sound)) <= 1.0
+
+
+def test_metrics_to_sound_into_buffer():
+    """Test writing a sound into a caller-provided buffer."""
+    engine = SoundEngine()
+    engine.prepare(0.1)
+    metrics = {"cpu_percent": 50.0, "network_rate": 0, "memory_percent": 60.0, "anomaly_score": 0.0}
+    out = np.zeros(int(engine.sample_rate * 0.1), dtype=np.float32)
+    
+    sound = engine.metrics_to_sound(metrics, 0.1, out=out)
+    
+    assert sound is out
+    assert np.array_equal(out, engine.metrics_to_sound(metrics, 0.1))
+
+
 def test_save_audio():
     """Test saving audio to WAV file."""
     engine = SoundEngine()
@@ -88,6 +217,22 @@ def test_save_audio():
             os.remove(filename)
 
 
+def test_save_audio_round_trip():
+    """Test that saved audio is quantized and clipped to 16-bit PCM."""
+    engine = SoundEngine()
+    audio = np.linspace(-2.0, 2.0, engine.sample_rate * 2 + 123, dtype=np.float32)
+    
+    buffer = io.BytesIO()
+    engine.save_audio(audio, buffer)
+    buffer.seek(0)
+    with wave.open(buffer, 'r') as wav_file:
+        assert wav_file.getnframes() == len(audio)
+        frames = np.frombuffer(wav_file.readframes(len(audio)), dtype=np.int16)
+    
+    expected = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    assert np.array_equal(frames, expected)
+
+
 def test_generate_soundscape():
     """Test generating a soundscape from multiple metrics."""
     engine = SoundEngine()
@@ -121,16 +266,36 @@ if __name__ == "__main__":
     print("✓ Sound engine initialization test passed")
     test_generate_tone()
     print("✓ Generate tone test passed")
+    test_generate_tone_matches_sine()
+    print("✓ Generate tone accuracy test passed")
+    test_envelope_low_sample_rate()
+    print("✓ Low sample rate envelope test passed")
+    test_long_tone_keeps_phase()
+    print("✓ Long tone phase test passed")
+    test_long_chord_keeps_phase()
+    print("✓ Long chord phase test passed")
+    test_caches_are_bounded()
+    print("✓ Bounded caches test passed")
     test_generate_chord()
     print("✓ Generate chord test passed")
     test_generate_pulse()
     print("✓ Generate pulse test passed")
+    test_generators_write_into_buffer()
+    print("✓ Generators into buffer test passed")
+    test_generators_return_float32()
+    print("✓ Generators float32 test passed")
     test_generate_noise()
     print("✓ Generate noise test passed")
     test_metrics_to_sound()
     print("✓ Metrics to sound test passed")
+    test_metrics_to_sound_anomalous()
+    print("✓ Anomalous metrics to sound test passed")
+    test_metrics_to_sound_into_buffer()
+    print("✓ Metrics to sound into buffer test passed")
     test_save_audio()
     print("✓ Save audio test passed")
+    test_save_audio_round_trip()
+    print("✓ Save audio round trip test passed")
     test_generate_soundscape()
     print("✓ Generate soundscape test passed")
     test_generate_demo_sound()